@@ -7,19 +7,22 @@ North-American Rail, Major Airports & Population-Weighted HSR Corridors - Folium
 Outputs:
   1) Interactive HTML map (north_america_rail_air_metro_corridors_pop_weighted_final.html)
   2) corridors_top100.geojson (top-100 great-circle LineStrings)
-  3) corridor_output_log.txt  (verbose per-corridor log, incl. anchor breakdown)
+  3) corridor_output_log.txt  (verbose log of the top-100, incl. anchor breakdown)
 """
 
-import itertools, re, textwrap
+import hashlib, io, json, re, textwrap, time
+from functools import lru_cache
 from pathlib import Path
 
 import geopandas as gpd
+import numpy as np
 import pandas as pd
 import requests
 import folium, branca
-from folium.plugins import MarkerCluster
-from shapely.geometry import LineString, Point
-from pyproj import Geod
+from folium.plugins import FastMarkerCluster
+from numba import njit, prange
+import shapely
+from pyproj import Geod, Transformer
 
 # ───────────── 0. FILE PATHS ───────────────────────────────────────────
 DATA = Path("/Data")
@@ -34,62 +37,184 @@ place_path    = DATA / "places_usa_2023.gpkg"                               # TI
 
 MIN_MI, MAX_MI = 100, 500
 TOP_N          = 100
+RAIL_SIMPLIFY  = 0.005                                                        # deg, map‑only rail simplification
 log_path       = OUTPUT / "corridor_output_log.txt"                           # detailed corridor log
+CACHE          = OUTPUT / "cache"                                             # on‑disk API / layer cache
+ACS_TTL_DAYS   = 30
 
 # ───────────── Misc. helpers ───────────────────────────────────────────
+SUFFIX_RE = re.compile(r"\s+(city|town|village|c?dp)$")
+
+@lru_cache(maxsize=100_000)                 # CBSA city names repeat heavily
 def norm(name: str) -> str:
     """Lower‑case & strip Census suffixes like ‘ city’, ‘ town’, ‘ village’, ‘ CDP’."""
-    name = name.lower().strip()
-    return re.sub(r"\s+(city|town|village|c?dp)$", "", name)
+    return SUFFIX_RE.sub("", name.lower().strip())
+
+def norm_series(names: pd.Series) -> pd.Series:
+    """norm() over a whole Series with pandas' vectorised string ops."""
+    return names.str.lower().str.strip().str.replace(SUFFIX_RE, "", regex=True)
+
+def census_json(url: str, params: dict) -> list:
+    """GET a Census API table, memoised on disk (keyed by URL + params) for ACS_TTL_DAYS."""
+    digest = hashlib.sha1(json.dumps([url, params], sort_keys=True).encode()).hexdigest()[:16]
+    cached = CACHE / f"acs_{digest}.json"
+    if cached.exists() and time.time() - cached.stat().st_mtime < ACS_TTL_DAYS * 86400:
+        return json.loads(cached.read_text(encoding="utf-8"))
+    resp = requests.get(url, params=params)
+    resp.raise_for_status()
+    CACHE.mkdir(parents=True, exist_ok=True)
+    cached.write_text(resp.text, encoding="utf-8")
+    return resp.json()
+
+def load_or_build(name: str, src: Path, loader, geo: bool = True):
+    """
+    Return CACHE/<name>_<hash of src path>.parquet (GeoParquet unless
+    geo=False) when it is newer than *src* and all its sidecar files
+    (.dbf, .shx, .prj, …); otherwise run loader(), persist its result
+    there and return it.
+    """
+    src    = src.resolve()
+    if not src.exists():
+        raise FileNotFoundError(src)
+    digest = hashlib.sha1(str(src).encode()).hexdigest()[:12]
+    cached = CACHE / f"{name}_{digest}.parquet"
+    src_mtime = max(f.stat().st_mtime for f in src.parent.glob(src.stem + ".*"))
+    if cached.exists() and cached.stat().st_mtime >= src_mtime:
+        return (gpd.read_parquet if geo else pd.read_parquet)(cached)
+    gdf = loader()
+    CACHE.mkdir(parents=True, exist_ok=True)
+    gdf.to_parquet(cached)
+    return gdf
 
 geod = Geod(ellps="WGS84")
-def miles(p1: Point, p2: Point) -> float:
-    _, _, d = geod.inv(p1.x, p1.y, p2.x, p2.y)
-    return d / 1609.344
+EARTH_R_MI = 3958.7613
 
-def gc_line(p1: Point, p2: Point, n=20) -> LineString:
-    pts = geod.npts(p1.x, p1.y, p2.x, p2.y, n - 2)
-    return LineString([(p1.x, p1.y), *pts, (p2.x, p2.y)])
+@njit(cache=True)
+def haversine_mi(lon1, lat1, lon2, lat2):
+    """Great‑circle miles on a sphere; inputs already in radians."""
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_R_MI * np.arcsin(np.sqrt(a))
+
+@njit(parallel=True, cache=True)
+def compute_pairs(lons, lats, pops, min_mi, max_mi):
+    """
+    All i < j pairs of anchors whose haversine distance lies in
+    [min_mi, max_mi], scored popA·popB / d².
+    Returns (out_i, out_j, out_d, out_score), unordered.
+
+    Anchors are swept in latitude order and each row stops as soon as the
+    latitude gap alone exceeds max_mi, so only the local neighbourhood of
+    each anchor is visited instead of all M·(M‑1)/2 pairs.  Numba has no
+    atomics, so a counting pass sizes each row's slice of the output
+    before the filling pass; rows run in parallel and every thread writes
+    only into the slices of the rows it owns.  Both passes must make the
+    same range decision for every pair, so no fastmath here.
+    """
+    n     = lons.shape[0]
+    order = np.argsort(lats)
+    lam   = np.radians(lons[order])
+    phi   = np.radians(lats[order])
+    max_dphi = max_mi / EARTH_R_MI
+
+    counts = np.zeros(n, dtype=np.int64)
+    for p in prange(n):
+        c = 0
+        for q in range(p + 1, n):
+            if phi[q] - phi[p] > max_dphi:
+                break
+            d = haversine_mi(lam[p], phi[p], lam[q], phi[q])
+            if min_mi <= d <= max_mi:
+                c += 1
+        counts[p] = c
+
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(counts)
+    out_i = np.empty(offsets[n], dtype=np.int32)
+    out_j = np.empty(offsets[n], dtype=np.int32)
+    out_d = np.empty(offsets[n], dtype=np.float32)
+    out_s = np.empty(offsets[n], dtype=np.float32)
+    for p in prange(n):
+        k = offsets[p]
+        for q in range(p + 1, n):
+            if phi[q] - phi[p] > max_dphi:
+                break
+            d = haversine_mi(lam[p], phi[p], lam[q], phi[q])
+            if min_mi <= d <= max_mi:
+                out_i[k] = min(order[p], order[q])
+                out_j[k] = max(order[p], order[q])
+                out_d[k] = d
+                out_s[k] = pops[order[p]] * pops[order[q]] / (d * d)
+                k += 1
+    return out_i, out_j, out_d, out_s
+
+def simplify_lines(gdf: gpd.GeoDataFrame, tol: float) -> gpd.GeoDataFrame:
+    """Geometry‑only Douglas‑Peucker copy of *gdf* for map serialisation."""
+    geoms = shapely.simplify(np.asarray(gdf.geometry), tol, preserve_topology=False)
+    return gpd.GeoDataFrame(geometry=geoms[~shapely.is_empty(geoms)], crs=gdf.crs)
+
+def gc_lines(lon1, lat1, lon2, lat2, n=20) -> np.ndarray:
+    """Great‑circle LineStrings (n vertices each) for arrays of endpoints."""
+    coords = np.empty((len(lon1), n, 2))
+    coords[:, 0]  = np.c_[lon1, lat1]
+    coords[:, -1] = np.c_[lon2, lat2]
+    for k in range(len(lon1)):
+        coords[k, 1:-1] = geod.npts(lon1[k], lat1[k], lon2[k], lat2[k], n - 2)
+    return shapely.linestrings(coords)                          # one GEOS call
 
 # ───────────── 1. LOAD CORE LAYERS ─────────────────────────────────────
 print("Loading datasets …")
-freight  = gpd.read_file(freight_path).to_crs(4326)[["geometry"]]
-amtrak   = gpd.read_file(amtrak_path ).to_crs(4326)[["geometry"]]
-stations = gpd.read_file(stations_path).to_crs(4326)
-air      = gpd.read_file(airports_path).to_crs(4326)
-states   = (gpd.read_file(states_path).to_crs(4326)[["geometry", "STUSPS"]]
+freight  = load_or_build("freight", freight_path,
+                         lambda: gpd.read_file(freight_path).to_crs(4326)[["geometry"]])
+amtrak   = load_or_build("amtrak", amtrak_path,
+                         lambda: gpd.read_file(amtrak_path ).to_crs(4326)[["geometry"]])
+stations = load_or_build("stations", stations_path,
+                         lambda: gpd.read_file(stations_path).to_crs(4326))
+air      = load_or_build("airports", airports_path,
+                         lambda: gpd.read_file(airports_path).to_crs(4326))
+states   = (load_or_build("states", states_path,
+                          lambda: gpd.read_file(states_path).to_crs(4326)[["geometry", "STUSPS"]])
             if states_path else None)
 
 # ───────────── 2. FILTER MAJOR AIRPORTS (simple heuristic) ────────────
-def is_major_airport(row):
-    cert = str(row.get("FAR_139_TY", "")).strip().upper()
-    code = str(row.get("ARPT_ID", "")).strip()
-    return cert.startswith("I") and len(code) == 3 and code.isalpha()
-
-air = air[air.apply(is_major_airport, axis=1)].copy()
-air["geometry"] = air.geometry.simplify(0.001)
+cert = air["FAR_139_TY"].astype(str).str.strip().str.upper()
+code = air["ARPT_ID"].astype(str).str.strip()
+is_major = cert.str.startswith("I") & (code.str.len() == 3) & code.str.isalpha()
+air = air.loc[is_major].copy()
+air["geometry"] = shapely.simplify(np.asarray(air.geometry), 0.001)
 print(f"  ✔ retained {len(air)} Class‑I airports")
 
 # ───────── 3. PRINCIPAL‑CITY WEIGHTED CBSA ANCHORS ────────────────────
 print("Computing principal‑city weighted anchors …")
 
-# 3‑A  TIGER/Line Places → centroids
-places_ll   = gpd.read_file(place_path, layer="places").to_crs(4326)
-places_proj = places_ll.to_crs("EPSG:5070")
-places_ll["centroid"] = places_proj.centroid.to_crs(4326)
-places_ll["key"]      = places_ll["NAME"].apply(norm) + "|" + places_ll["STATEFP"]
-place_lookup = dict(zip(places_ll["key"], places_ll["centroid"]))
+# 3‑A  TIGER/Line Places → (key, cx, cy) centroid table, cached as Parquet
+def build_place_xy() -> pd.DataFrame:
+    places_proj = gpd.read_file(place_path, layer="places").to_crs("EPSG:5070")
+    centroids   = shapely.centroid(np.asarray(places_proj.geometry))   # one GEOS call
+    albers_to_ll = Transformer.from_crs("EPSG:5070", 4326, always_xy=True)
+    cx, cy = albers_to_ll.transform(shapely.get_x(centroids), shapely.get_y(centroids))
+    return (pd.DataFrame({
+                "key": norm_series(places_proj["NAME"]).str.cat(places_proj["STATEFP"], sep="|"),
+                "cx":  cx,
+                "cy":  cy,
+            })
+            .drop_duplicates("key", keep="last")
+            .reset_index(drop=True))
+
+# keys depend on norm_series/SUFFIX_RE, so the regex is part of the cache name
+norm_tag = hashlib.sha1(SUFFIX_RE.pattern.encode()).hexdigest()[:8]
+place_xy = load_or_build(f"place_xy_{norm_tag}", place_path, build_place_xy, geo=False)
 
 # 3‑B  ACS 2023 place‑level population
-acs_place = requests.get(
+acs_place = census_json(
     "https://api.census.gov/data/2023/acs/acs5",
     params={"get": "NAME,B01001_001E", "for": "place:*"}
-).json()
+)
 pop_place = pd.DataFrame(acs_place[1:], columns=["CENSUS_NAME", "POP", "STATE", "PLACEFP"])
 pop_place["POP"]   = pd.to_numeric(pop_place["POP"], errors="coerce")
-pop_place["CITY"]  = pop_place["CENSUS_NAME"].str.replace(r",.*$", "", regex=True).apply(norm)
-pop_place["key"]   = pop_place["CITY"] + "|" + pop_place["STATE"]
-pop_lookup = pop_place.set_index("key")["POP"].to_dict()
+pop_place["CITY"]  = norm_series(pop_place["CENSUS_NAME"].str.replace(r",.*$", "", regex=True))
+pop_place["key"]   = pop_place["CITY"].str.cat(pop_place["STATE"], sep="|")
+pop_keys = pop_place.drop_duplicates("key", keep="last")[["key", "POP"]]
 
 # 3‑C  State abbrev. → FIPS
 state_abbr_to_fips = {
@@ -102,102 +227,111 @@ state_abbr_to_fips = {
  'WV':'54','WI':'55','WY':'56','PR':'72','VI':'78','GU':'66','AS':'60','MP':'69'
 }
 
-def anchor_from_principal_cities(name_field, poly_geom):
-    """
-    Given CBSA NAME ('Chicago-Naperville-Elgin, IL-IN-WI'), return
-    a population‑weighted anchor Point plus a debug list:
-      (anchor_pt, [(city, ST, lat, lon, pop), …])
-    """
-    name_part, state_part = name_field.split(",", 1)
-    cities  = [norm(c) for c in name_part.split("-")]
-    states  = [s.strip() for s in state_part.split()[0].split("-")]
-
-    pts, wts, dbg = [], [], []
-    for city in cities:
-        for st_abbr in states:
-            fips = state_abbr_to_fips.get(st_abbr)
-            if not fips:
-                continue
-            key = f"{city}|{fips}"
-            if key in place_lookup:
-                pt  = place_lookup[key]
-                pop = pop_lookup.get(key, 1)
-                pts.append(pt);  wts.append(pop)
-                dbg.append((city.title(), st_abbr, pt.y, pt.x, None if pop == 1 else pop))
-                break  # only keep first matching state for city
-
-    if pts:
-        tot    = sum(wts)
-        anchor = Point(sum(p.x * w for p, w in zip(pts, wts)) / tot,
-                       sum(p.y * w for p, w in zip(pts, wts)) / tot)
-    else:
-        anchor, dbg = poly_geom.representative_point(), []
-
-    return anchor, dbg
-
-# 3‑D  Apply to every CBSA
-cbsa_raw = gpd.read_file(cbsa_path).to_crs(4326)[["GEOID", "NAME", "geometry"]]
-anchors, anchor_debugs = [], []
-for _, rec in cbsa_raw.iterrows():
-    pt, dbg = anchor_from_principal_cities(rec.NAME, rec.geometry)
-    anchors.append(pt);  anchor_debugs.append(dbg)
-
-cbsa = cbsa_raw.copy()
-cbsa["anchor"]       = anchors
-cbsa["anchor_debug"] = anchor_debugs
-cbsa = cbsa.set_geometry("anchor")
+# 3‑D  One row per candidate (CBSA, principal city, state) → place match
+#      'Chicago-Naperville-Elgin, IL-IN-WI' → chicago|17, chicago|18, …
+cbsa_raw = load_or_build("cbsa", cbsa_path,
+                         lambda: gpd.read_file(cbsa_path).to_crs(4326)[["GEOID", "NAME", "geometry"]])
+name_parts = cbsa_raw["NAME"].str.split(",", n=1, expand=True)
+cands = pd.DataFrame({
+    "GEOID": cbsa_raw["GEOID"],
+    "city":  name_parts[0].str.split("-"),
+    "ST":    name_parts[1].str.split().str[0].str.split("-"),
+}).explode("city")
+cands["city_no"] = cands.groupby(level=0).cumcount()
+cands["city"]    = cands["city"].map(norm)
+cands = cands.explode("ST")
+cands["ST"]  = cands["ST"].str.strip()
+cands["key"] = cands["city"] + "|" + cands["ST"].map(state_abbr_to_fips)
+cands = (cands.merge(place_xy, on="key")                  # keeps left order
+              .drop_duplicates(["GEOID", "city_no"])      # first matching state per city
+              .merge(pop_keys, on="key", how="left"))
+
+# 3‑E  Population‑weighted mean of the matched principal cities
+cands["w"]   = cands["POP"].fillna(1)
+cands["wx"]  = cands["cx"] * cands["w"]
+cands["wy"]  = cands["cy"] * cands["w"]
+cands["dbg"] = [(c.title(), st, y, x, None if w == 1 else int(w))
+                for c, st, y, x, w in zip(cands["city"], cands["ST"],
+                                          cands["cy"], cands["cx"], cands["w"])]
+by_cbsa   = cands.groupby("GEOID", sort=False)
+anchor_df = pd.DataFrame({
+    "cx":           by_cbsa["wx"].sum() / by_cbsa["w"].sum(),
+    "cy":           by_cbsa["wy"].sum() / by_cbsa["w"].sum(),
+    "anchor_debug": by_cbsa["dbg"].agg(list),
+})
+
+# 3‑F  Attach anchors; CBSAs with no matched city fall back to the polygon
+#      (anchors kept as plain lon/lat float columns, not shapely Points)
+cbsa = cbsa_raw.merge(anchor_df, left_on="GEOID", right_index=True, how="left")
+no_match = cbsa["cx"].isna().to_numpy()
+fallback = shapely.point_on_surface(np.asarray(cbsa.geometry)[no_match])
+cbsa.loc[no_match, "cx"] = shapely.get_x(fallback)
+cbsa.loc[no_match, "cy"] = shapely.get_y(fallback)
+cbsa["anchor_debug"] = [[] if miss else dbg
+                        for miss, dbg in zip(no_match, cbsa["anchor_debug"])]
 
 # ───────────── 4. CBSA POPULATION (for scoring) ───────────────────────
-acs_cbsa = requests.get(
+acs_cbsa = census_json(
     "https://api.census.gov/data/2023/acs/acs1",
     params={
         "get": "NAME,B01001_001E",
         "for": "metropolitan statistical area/micropolitan statistical area:*"
     }
-).json()
+)
 pop_cbsa = pd.DataFrame(acs_cbsa[1:], columns=["NAME", "POP", "GEOID"])
 pop_cbsa["POP"] = pd.to_numeric(pop_cbsa["POP"], errors="coerce")
-cbsa = cbsa.merge(pop_cbsa[["GEOID", "POP"]], on="GEOID", how="left")
+cbsa = (cbsa.merge(pop_cbsa[["GEOID", "POP"]], on="GEOID", how="left")
+            .dropna(subset=["POP"])                  # unscorable without a population
+            .reset_index(drop=True))
 
-# ───────────── 5. SCORE & LOG EVERY ELIGIBLE PAIR ─────────────────────
+# ───────────── 5. SCORE EVERY ELIGIBLE PAIR, LOG THE TOP‑N ────────────
 print("Scoring corridors …")
-pairs, corridor_no = [], 1
-with open(log_path, "w", encoding="utf-8") as log:
-    for (_, a), (_, b) in itertools.combinations(cbsa.iterrows(), 2):
-        if pd.isna(a.POP) or pd.isna(b.POP):
-            continue
-        d = miles(a.anchor, b.anchor)
-        if not (MIN_MI <= d <= MAX_MI):
-            continue
-
-        score = (a.POP * b.POP) / d**2
-        pairs.append({
-            "from":     a.NAME.split(",")[0],
-            "to":       b.NAME.split(",")[0],
-            "score":    score,
-            "geometry": gc_line(a.anchor, b.anchor)
-        })
-
-        # ── verbose corridor log ──────────────────────────────────────
-        log.write(f"{corridor_no}. Corridor: {a.NAME} ↔ {b.NAME}\n")
-        log.write(f"   From: {a.anchor.y:.4f}, {a.anchor.x:.4f}  |  "
-                  f"To: {b.anchor.y:.4f}, {b.anchor.x:.4f}\n")
+# haversine is plenty for the range filter; Geod is kept for gc_lines only
+lons = cbsa["cx"].to_numpy(dtype="float64")
+lats = cbsa["cy"].to_numpy(dtype="float64")
+pop  = cbsa["POP"].to_numpy(dtype="float64")
+# filter + score in one parallel kernel; float32 is ample for ranking
+# (output is unordered; ties are broken only inside the top‑N below)
+ii, jj, dist, scores = compute_pairs(lons, lats, pop, float(MIN_MI), float(MAX_MI))
+
+names  = cbsa["NAME"].to_numpy()
+debugs = cbsa["anchor_debug"].to_numpy()
+
+print(f"  ✔ corridors scored ({len(scores)})")
+
+# top-N without a full sort; only these get great-circle LineStrings
+top = (np.argpartition(-scores, TOP_N)[:TOP_N] if len(scores) > TOP_N
+       else np.arange(len(scores)))
+# float32 only picks the top‑N; their distances & scores are redone in float64
+# and those decide the final order (ties → combinations order)
+top_dist = haversine_mi(np.radians(lons[ii[top]]), np.radians(lats[ii[top]]),
+                        np.radians(lons[jj[top]]), np.radians(lats[jj[top]]))
+top_scores = pop[ii[top]] * pop[jj[top]] / top_dist**2
+rank = np.lexsort((jj[top], ii[top], -top_scores))
+top, top_dist, top_scores = top[rank], top_dist[rank], top_scores[rank]
+corridors = gpd.GeoDataFrame({
+    "from":     [names[i].split(",")[0] for i in ii[top]],
+    "to":       [names[j].split(",")[0] for j in jj[top]],
+    "score":    top_scores,
+    "geometry": gc_lines(lons[ii[top]], lats[ii[top]], lons[jj[top]], lats[jj[top]]),
+}, crs=4326)
+
+# ── verbose corridor log (top-N only, ranked) ─────────────────────────
+with io.open(log_path, "w", encoding="utf-8", buffering=1 << 20) as log:
+    for corridor_no, (i, j, d, score) in enumerate(
+            zip(ii[top], jj[top], top_dist, top_scores), 1):
+        log.write(f"{corridor_no}. Corridor: {names[i]} ↔ {names[j]}\n")
+        log.write(f"   From: {lats[i]:.4f}, {lons[i]:.4f}  |  "
+                  f"To: {lats[j]:.4f}, {lons[j]:.4f}\n")
         log.write(f"   Distance: {d:.1f} mi  |  Score: {score:,.0f}\n")
-        for side, rec in (("From", a), ("To", b)):
-            log.write(f"   Cities ({side}: {rec.NAME}):\n")
-            for city, st, lat, lon, pop in rec.anchor_debug:
-                pop_txt = f"{pop:,}" if pop else "N/A"
+        for side, k in (("From", i), ("To", j)):
+            log.write(f"   Cities ({side}: {names[k]}):\n")
+            for city, st, lat, lon, p in debugs[k]:
+                pop_txt = f"{p:,}" if p else "N/A"
                 log.write(f"      - {city}, {st} → ({lat:.4f}, {lon:.4f})  Pop: {pop_txt}\n")
         log.write("\n")
-        corridor_no += 1
+print(f"  ✔ top‑{TOP_N} corridors logged")
 
-print(f"  ✔ corridors computed & logged ({corridor_no - 1})")
-
-corridors = (
-    gpd.GeoDataFrame(pairs, crs=4326)
-      .sort_values("score", ascending=False)
-      .head(TOP_N)
-)
 corridors.to_file(OUTPUT / "corridors_top100.geojson", driver="GeoJSON")
 print("  ✔ top‑100 corridors saved to corridors_top100.geojson")
 
@@ -213,43 +347,51 @@ if states is not None:
                        "color": "black", "weight": 1, "fillOpacity": 0
                    }).add_to(m)
 
-folium.GeoJson(freight, name="Freight Rail",
+folium.GeoJson(simplify_lines(freight, RAIL_SIMPLIFY), name="Freight Rail",
                style_function=lambda _:{
                    "color": "#8B4513", "weight": 1, "opacity": 0.7
                }).add_to(m)
 
-folium.GeoJson(amtrak, name="Amtrak Routes",
+folium.GeoJson(simplify_lines(amtrak, RAIL_SIMPLIFY), name="Amtrak Routes",
                style_function=lambda _:{
                    "color": "#008000", "weight": 2, "opacity": 0.9
                }).add_to(m)
 
-# stations & airports
-clu = MarkerCluster(name="Amtrak Stations").add_to(m)
+# stations & airports – shipped as one data array each, markers built client‑side
 name_col = next((c for c in ["StationNam", "Name", "NAME", "STATION"] if c in stations), None)
-for _, r in stations.iterrows():
-    folium.Marker(
-        [r.geometry.y, r.geometry.x],
-        popup=r.get(name_col, "Station"),
-        icon=folium.Icon(color="blue", icon="train", prefix="fa")
-    ).add_to(clu)
-
-air_fg = folium.FeatureGroup(name="Airports (Class‑I)")
-for _, r in air.iterrows():
-    folium.CircleMarker(
-        [r.geometry.y, r.geometry.x],
-        radius=6, color="purple", fill=True, fill_opacity=0.6,
-        popup=r.get("ARPT_NAME", "Airport")
-    ).add_to(air_fg)
-air_fg.add_to(m)
+st_names = (stations[name_col].fillna("Station").astype(str) if name_col
+            else pd.Series("Station", index=stations.index))
+FastMarkerCluster(
+    data=[[y, x, n] for y, x, n in zip(stations.geometry.y, stations.geometry.x, st_names)],
+    name="Amtrak Stations",
+    callback="""
+    function (row) {
+        var icon = L.AwesomeMarkers.icon({icon: "train", prefix: "fa", markerColor: "blue"});
+        return L.marker(new L.LatLng(row[0], row[1]), {icon: icon}).bindPopup(row[2]);
+    }"""
+).add_to(m)
+
+air_names = (air["ARPT_NAME"].fillna("Airport").astype(str) if "ARPT_NAME" in air
+             else "Airport")
+air_pts = air[["geometry"]].assign(ARPT_NAME=air_names)
+folium.GeoJson(
+    air_pts, name="Airports (Class‑I)",
+    marker=folium.CircleMarker(radius=6, color="purple", fill=True, fill_opacity=0.6),
+    popup=folium.GeoJsonPopup(fields=["ARPT_NAME"], labels=False)
+).add_to(m)
 
 cmap = branca.colormap.LinearColormap(["yellow", "orange", "red"], vmin=0, vmax=max_s)
+# colour & weight baked into the features once, so the style function is a lookup
+corridors["color"]  = corridors["score"].map(cmap)
+corridors["weight"] = 1 + 6 * (corridors["score"] / max_s)
 folium.GeoJson(
     corridors, name=f"Top {TOP_N} Corridors",
     style_function=lambda f:{
-        "color": cmap(f["properties"]["score"]),
-        "weight": 1 + 6 * (f["properties"]["score"] / max_s),
+        "color":  f["properties"]["color"],
+        "weight": f["properties"]["weight"],
         "opacity": 0.8
     },
+    smooth_factor=2.0,
     tooltip=folium.GeoJsonTooltip(fields=["from", "to"], aliases=["From", "To"])
 ).add_to(m)
 cmap.caption = "Corridor Score"; cmap.add_to(m)